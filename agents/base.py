@@ -1,10 +1,136 @@
 """Base agent class with Claude API integration."""
 
 import anthropic
-from typing import Generator
+import atexit
+import hashlib
+import httpx
+import json
+import logging
+import queue
+import re
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from logging.handlers import QueueHandler, QueueListener
+from typing import Callable, Generator
 from dataclasses import dataclass
 import config
 from agents.tools import execute_tool
+from agents.rate_limit import RateLimiter
+
+# Agent progress goes through a queue drained by one listener thread, so agents
+# and tool threads never block on stdout while logging. The thread is started
+# when the first agent is created.
+logger = logging.getLogger("agents")
+logger.setLevel(logging.INFO)
+logger.propagate = False
+_log_queue = queue.SimpleQueue()
+logger.addHandler(QueueHandler(_log_queue))
+_log_listener: QueueListener = None
+_log_listener_lock = threading.Lock()
+
+
+def _start_log_listener():
+    """Start the thread that writes queued agent log records to stdout."""
+    global _log_listener
+    with _log_listener_lock:
+        if _log_listener is None:
+            stdout_handler = logging.StreamHandler(sys.stdout)
+            stdout_handler.setFormatter(logging.Formatter("%(message)s"))
+            _log_listener = QueueListener(_log_queue, stdout_handler)
+            _log_listener.start()
+            atexit.register(_log_listener.stop)
+
+
+_SHARED_CLIENT: anthropic.Anthropic = None
+_SHARED_CLIENT_LOCK = threading.Lock()
+
+
+def get_shared_client() -> anthropic.Anthropic:
+    """
+    Return the process-wide Anthropic client. All agents share one pooled
+    HTTP client so keep-alive connections are reused instead of each agent
+    doing its own TLS handshake. The SDK client is thread-safe.
+    """
+    global _SHARED_CLIENT
+    with _SHARED_CLIENT_LOCK:
+        if _SHARED_CLIENT is None:
+            _SHARED_CLIENT = anthropic.Anthropic(
+                api_key=config.ANTHROPIC_API_KEY,
+                # No timeout here, so the SDK's default applies: a non-streaming
+                # response sends nothing until it's fully generated
+                http_client=httpx.Client(
+                    limits=httpx.Limits(
+                        max_keepalive_connections=8,
+                        max_connections=16,
+                        keepalive_expiry=60.0
+                    )
+                )
+            )
+        return _SHARED_CLIENT
+
+
+# Shared by every agent so parallel agents stay under the account-wide limits
+_RATE_LIMITER = RateLimiter(config.ANTHROPIC_RPM, config.ANTHROPIC_TPM)
+
+# Opening-turn requests in flight, keyed by request hash and shared so identical
+# requests sent by different agents at the same time go out once
+_INFLIGHT_REQUESTS: dict[str, Future] = {}
+_INFLIGHT_REQUESTS_LOCK = threading.Lock()
+
+SUMMARY_PREFIX = "[Summary of earlier turns]"
+
+_COMPLETION_TEXT = re.compile(
+    r"\b(task[_ ]complete|all done|implementation complete)\b", re.IGNORECASE
+)
+_NEGATION = re.compile(r"\b(not|no|never|cannot|unable|yet to)\b|n['’]t\b", re.IGNORECASE)
+
+
+def _states_completion(text: str) -> bool:
+    """Check whether text says the work is done, ignoring negated mentions."""
+    for match in _COMPLETION_TEXT.finditer(text):
+        sentence_start = max(text.rfind(c, 0, match.start()) for c in ".!?\n") + 1
+        if not _NEGATION.search(text, sentence_start, match.start()):
+            return True
+    return False
+
+
+def _has_tool_results(messages: list[dict]) -> bool:
+    """Check whether any message in a conversation carries a tool_result block."""
+    for message in messages:
+        content = message["content"]
+        if not isinstance(content, str) and any(
+            isinstance(block, dict) and block.get("type") == "tool_result"
+            for block in content
+        ):
+            return True
+    return False
+
+
+def _render_message(message: dict) -> str:
+    """Render a conversation message as plain text for the summarizer."""
+    role = message["role"]
+    content = message["content"]
+    if isinstance(content, str):
+        return f"{role}: {content}"
+
+    lines = []
+    for block in content:
+        if isinstance(block, dict):
+            block_type = block.get("type")
+            get = block.get
+        else:
+            block_type = getattr(block, "type", None)
+            get = lambda key, b=block: getattr(b, key, None)
+
+        if block_type == "text":
+            lines.append(f"{role}: {get('text')}")
+        elif block_type == "tool_use":
+            lines.append(f"{role} called {get('name')}: {json.dumps(get('input'))[:500]}")
+        elif block_type == "tool_result":
+            lines.append(f"tool result: {str(get('content'))[:1000]}")
+    return "\n".join(lines)
 
 
 @dataclass
@@ -14,95 +140,165 @@ class AgentResult:
     message: str
     tokens_used: int
     tool_name: str = None  # The final tool that was called (task_complete, approve, reject)
+    cache_read_tokens: int = 0  # Portion of tokens_used served from the prompt cache
 
 
 class BaseAgent:
     """Base class for all agents with Claude API integration."""
 
-    def __init__(self, agent_id: str, system_prompt: str, tools: list[dict]):
+    _TERMINAL_TOOLS = frozenset({"task_complete", "approve", "reject"})
+    # Tools that only read, so they can run alongside each other
+    _READ_ONLY_TOOLS = frozenset({"read_file", "list_files"})
+
+    # Summary-taking terminal tool implied when the model says it's done
+    # without calling one (None disables the shortcut for this agent type)
+    text_completion_tool: str = None
+
+    # max_tokens for the first turn, before there's any output history to go on,
+    # and the smallest budget any later turn gets
+    initial_max_tokens = 4096
+
+    def __init__(self, agent_id: str, system_prompt: str, tools: list[dict],
+                 on_tokens: Callable[[str, int], None] = None,
+                 stop_event: threading.Event = None):
+        _start_log_listener()
         self.agent_id = agent_id
         self.system_prompt = system_prompt
+        # Shared, pre-built tool list (e.g. CODING_TOOLS_CACHED); never mutated here
         self.tools = tools
-        self.client = anthropic.Anthropic(api_key=config.ANTHROPIC_API_KEY)
+        # Size of the static prefix, measured once for rate-limit estimates
+        self._static_prompt_chars = len(self.system_prompt) + len(json.dumps(tools))
+        self.client = get_shared_client()
         self.conversation_history: list[dict] = []
         self.total_tokens = 0
+        self.cache_read_tokens = 0
+        self.batch_tokens = 0  # Portion of tokens_used billed at the batch discount
+        # Called with (agent_id, billed tokens) after every response, e.g. StateManager.add_agent_tokens
+        self.on_tokens = on_tokens
+        # When set, run() returns before its next turn instead of calling the API again
+        self.stop_event = stop_event or threading.Event()
+        self._tool_pool = ThreadPoolExecutor(max_workers=config.TOOL_CONCURRENCY_LIMIT)
+        self._output_ema: float = None  # Moving average of output tokens per turn
 
     def reset_conversation(self):
-        """Clear conversation history for a new task."""
-        self.conversation_history = []
+        """Clear conversation history for a new task, reusing the list."""
+        self.conversation_history.clear()
 
-    def run(self, task_prompt: str, max_turns: int = None) -> AgentResult:
+    def run(self, task_prompt: str, max_turns: int = None,
+            use_batch: bool = False) -> AgentResult:
         """
         Run the agent with a task prompt. Continues until a terminal tool is called
-        or max_turns is reached.
+        or max_turns is reached. With use_batch, the first turn goes through the
+        Message Batches API; follow-up turns are always synchronous.
         """
         if max_turns is None:
             max_turns = config.MAX_AGENT_TURNS
 
-        # Add the task to conversation
+        # Add the task to conversation. The opening task prompt is stable for the
+        # whole run, so put a cache breakpoint after it; later turns (tool results,
+        # feedback) are volatile and stay uncached.
         self.conversation_history.append({
             "role": "user",
-            "content": task_prompt
+            "content": self._prompt_content(task_prompt, cache=not self.conversation_history)
         })
 
-        terminal_tools = {"task_complete", "approve", "reject"}
-
         for turn in range(max_turns):
-            # Call Claude
-            response = self.client.messages.create(
-                model=config.MODEL,
-                max_tokens=8096,
-                system=self.system_prompt,
-                tools=self.tools,
-                messages=self.conversation_history
-            )
+            if self.stop_event.is_set():
+                return self._stopped_result()
+
+            self._compact_history()
+
+            # Read-only tools started while the response is still streaming
+            started: dict[str, Future] = {}
+            seen_other = False
 
-            # Track tokens
-            tokens_this_turn = response.usage.input_tokens + response.usage.output_tokens
-            self.total_tokens += tokens_this_turn
+            def start_tool(block):
+                nonlocal seen_other
+                # Only reads that no earlier call in the response could affect
+                # start early; everything else waits for the full response
+                seen_other = seen_other or block.name not in self._READ_ONLY_TOOLS
+                if not seen_other:
+                    logger.info("  [%s] Tool: %s", self.agent_id, block.name)
+                    started[block.id] = self._tool_pool.submit(self._execute_tool_block, block)
+
+            # Call Claude (a failed batch request falls back to a synchronous call)
+            response = None
+            if use_batch and turn == 0:
+                response = self._submit_batch([self.conversation_history])[0]
+                if response is None and self.stop_event.is_set():
+                    return self._stopped_result()
+            if response is None:
+                params = self._request_params(self.conversation_history)
+                if turn == 0 and not _has_tool_results(self.conversation_history):
+                    response = self._create_message_deduped(params)
+                else:
+                    response = self._create_message(params, on_tool_use=start_tool)
+
+            # A turn that ran out of tokens doubles the next turn's budget
+            max_tokens = self._max_tokens()
+            if response.stop_reason == "max_tokens" and max_tokens < config.MAX_OUTPUT_TOKENS:
+                self._output_ema = max_tokens * 2 / 1.5
+            else:
+                self._update_output_ema(response.usage.output_tokens)
 
             # Process response
             assistant_message = {"role": "assistant", "content": response.content}
             self.conversation_history.append(assistant_message)
 
+            # Tool calls in a response that didn't stop for them aren't run, but
+            # every tool_use block needs a result; reads that already started
+            # finish and are reported
+            unrun_results = []
+            if response.stop_reason != "tool_use":
+                unrun_results = [
+                    started[block.id].result() if block.id in started else {
+                        "type": "tool_result",
+                        "tool_use_id": block.id,
+                        "content": "Not run: your response was cut off before this call could run. Send it again.",
+                        "is_error": True
+                    }
+                    for block in response.content if block.type == "tool_use"
+                ]
+
             # Check if we need to handle tool calls
             if response.stop_reason == "tool_use":
-                tool_results = []
-
-                for block in response.content:
-                    if block.type == "tool_use":
-                        tool_name = block.name
-                        tool_input = block.input
-
-                        print(f"  [{self.agent_id}] Tool: {tool_name}")
-
-                        # Execute the tool
-                        result = execute_tool(tool_name, tool_input)
-
-                        # Check if this is a terminal tool
-                        if tool_name in terminal_tools:
-                            # Add tool result to history for completeness
-                            self.conversation_history.append({
-                                "role": "user",
-                                "content": [{
-                                    "type": "tool_result",
-                                    "tool_use_id": block.id,
-                                    "content": result
-                                }]
-                            })
-
-                            return AgentResult(
-                                success=tool_name in {"task_complete", "approve"},
-                                message=result,
-                                tokens_used=self.total_tokens,
-                                tool_name=tool_name
-                            )
-
-                        tool_results.append({
-                            "type": "tool_result",
-                            "tool_use_id": block.id,
-                            "content": result
-                        })
+                tool_blocks = [b for b in response.content if b.type == "tool_use"]
+
+                # Split off the first terminal tool; anything after it is never run
+                terminal_block = None
+                for i, block in enumerate(tool_blocks):
+                    if block.name in self._TERMINAL_TOOLS:
+                        terminal_block = block
+                        for skipped in tool_blocks[i + 1:]:
+                            logger.info("  [%s] Skipping tool after %s: %s", self.agent_id, block.name, skipped.name)
+                        tool_blocks = tool_blocks[:i]
+                        break
+
+                tool_results = self._execute_tools(tool_blocks, started)
+
+                if terminal_block is not None:
+                    tool_name = terminal_block.name
+                    logger.info("  [%s] Tool: %s", self.agent_id, tool_name)
+                    result = execute_tool(tool_name, terminal_block.input)
+
+                    # Add tool results to history for completeness
+                    tool_results.append({
+                        "type": "tool_result",
+                        "tool_use_id": terminal_block.id,
+                        "content": result
+                    })
+                    self.conversation_history.append({
+                        "role": "user",
+                        "content": tool_results
+                    })
+
+                    return AgentResult(
+                        success=tool_name != "reject",
+                        message=result,
+                        tokens_used=self.total_tokens,
+                        tool_name=tool_name,
+                        cache_read_tokens=self.cache_read_tokens
+                    )
 
                 # Add tool results to conversation
                 if tool_results:
@@ -114,16 +310,44 @@ class BaseAgent:
             elif response.stop_reason == "end_turn":
                 # Model finished without calling a terminal tool
                 # Extract text response
-                text_content = ""
-                for block in response.content:
-                    if hasattr(block, 'text'):
-                        text_content += block.text
+                text_content = "".join(
+                    b.text for b in response.content if getattr(b, "type", None) == "text"
+                )
+
+                # If the text already declares the work done, treat it as the
+                # terminal tool call rather than spending a turn on a nudge
+                if (config.AUTO_TERMINAL_FROM_TEXT
+                        and self.text_completion_tool
+                        and turn >= 2
+                        and _states_completion(text_content)):
+                    tool_name = self.text_completion_tool
+                    logger.info("  [%s] Completion stated in text, treating as %s", self.agent_id, tool_name)
+                    return AgentResult(
+                        success=tool_name != "reject",
+                        message=execute_tool(tool_name, {"summary": text_content}),
+                        tokens_used=self.total_tokens,
+                        tool_name=tool_name,
+                        cache_read_tokens=self.cache_read_tokens
+                    )
 
                 # If the model is done talking but didn't call a terminal tool,
                 # prompt it to do so
                 self.conversation_history.append({
                     "role": "user",
-                    "content": "Please call the appropriate tool to indicate you're done (task_complete if you're a coding agent, or approve/reject if you're QA)."
+                    "content": unrun_results + [{
+                        "type": "text",
+                        "text": "Please call the appropriate tool to indicate you're done (task_complete if you're a coding agent, or approve/reject if you're QA)."
+                    }]
+                })
+
+            elif response.stop_reason == "max_tokens":
+                # Keep the partial response and let the model carry on from it
+                self.conversation_history.append({
+                    "role": "user",
+                    "content": unrun_results + [{
+                        "type": "text",
+                        "text": "Your last response was cut off at the output token limit. Continue from where you stopped."
+                    }]
                 })
 
         # Max turns reached
@@ -131,9 +355,284 @@ class BaseAgent:
             success=False,
             message=f"Max turns ({max_turns}) reached without completion",
             tokens_used=self.total_tokens,
-            tool_name=None
+            tool_name=None,
+            cache_read_tokens=self.cache_read_tokens
         )
 
+    def _stopped_result(self) -> AgentResult:
+        return AgentResult(
+            success=False,
+            message="Stopped before completion",
+            tokens_used=self.total_tokens,
+            tool_name=None,
+            cache_read_tokens=self.cache_read_tokens
+        )
+
+    def run_batch(self, prompts: list[str]) -> list:
+        """
+        Submit the first turn of several independent prompts as a single
+        Message Batch and wait for it to finish. Returns the response message
+        for each prompt in order, or None where that request did not succeed.
+        """
+        return self._submit_batch([
+            [{"role": "user", "content": self._prompt_content(prompt, cache=True)}]
+            for prompt in prompts
+        ])
+
+    def _submit_batch(self, conversations: list[list[dict]]) -> list:
+        """
+        Send one batch request per conversation and poll until it has ended.
+        If the run is stopped meanwhile, the batch is cancelled and every
+        response comes back as None.
+        """
+        requests = [
+            {
+                "custom_id": f"{self.agent_id}-{i}",
+                "params": self._request_params(messages)
+            }
+            for i, messages in enumerate(conversations)
+        ]
+        batch = self.client.messages.batches.create(requests=requests)
+        logger.info("  [%s] Submitted batch %s (%s requests)", self.agent_id, batch.id, len(requests))
+
+        while batch.processing_status != "ended":
+            # Waiting on the stop event wakes a stopped run without a full poll interval
+            if self.stop_event.wait(config.BATCH_POLL_INTERVAL):
+                self.client.messages.batches.cancel(batch.id)
+                logger.info("  [%s] Cancelled batch %s", self.agent_id, batch.id)
+                return [None] * len(requests)
+            batch = self.client.messages.batches.retrieve(batch.id)
+
+        responses = {}
+        for entry in self.client.messages.batches.results(batch.id):
+            if entry.result.type == "succeeded":
+                responses[entry.custom_id] = entry.result.message
+                self._track_usage(entry.result.message, batched=True)
+            else:
+                logger.info("  [%s] Batch request %s %s", self.agent_id, entry.custom_id, entry.result.type)
+
+        return [responses.get(r["custom_id"]) for r in requests]
+
+    def _create_message(self, params: dict, on_tool_use=None):
+        """
+        Call Claude once the shared rate limiter admits the request. With
+        on_tool_use, the response is streamed and the callback gets each
+        tool_use block as soon as it is complete, before the message ends.
+        """
+        # Rough estimate (~4 chars per token); reconciled against real usage below.
+        # Only the messages are serialized; the static prefix size is precomputed.
+        chars = len(json.dumps(params["messages"], default=str))
+        if "tools" in params:
+            chars += self._static_prompt_chars
+        estimated = chars // 4
+        _RATE_LIMITER.acquire(estimated)
+
+        if on_tool_use is None:
+            response = self.client.messages.create(**params)
+        else:
+            with self.client.messages.stream(**params) as stream:
+                for event in stream:
+                    if event.type == "content_block_stop" and event.content_block.type == "tool_use":
+                        on_tool_use(event.content_block)
+                response = stream.get_final_message()
+
+        usage = response.usage
+        actual = usage.input_tokens + (getattr(usage, "cache_creation_input_tokens", 0) or 0)
+        _RATE_LIMITER.reconcile(estimated, actual)
+        self._track_usage(response)
+        return response
+
+    def _create_message_deduped(self, params: dict):
+        """
+        Like _create_message, but a caller that arrives while an identical
+        request is in flight waits for it instead of sending a duplicate.
+        Responses aren't kept once the request finishes, so a retried task
+        samples a fresh opening.
+        """
+        key = hashlib.blake2b(
+            json.dumps(params, default=str, sort_keys=True).encode()
+        ).hexdigest()
+
+        with _INFLIGHT_REQUESTS_LOCK:
+            shared = _INFLIGHT_REQUESTS.get(key)
+            if shared is None:
+                future = _INFLIGHT_REQUESTS[key] = Future()
+
+        if shared is not None:
+            logger.info("  [%s] Reusing response for identical request", self.agent_id)
+            return shared.result()
+
+        try:
+            response = self._create_message(params)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with _INFLIGHT_REQUESTS_LOCK:
+                del _INFLIGHT_REQUESTS[key]
+        future.set_result(response)
+        return response
+
+    def _compact_history(self):
+        """
+        Keep the opening task prompt and the last HISTORY_WINDOW_TURNS exchanges
+        verbatim and fold everything in between into one summary message, so
+        per-turn input stays bounded instead of growing with every turn.
+        Compaction happens in batches of HISTORY_COMPACT_EVERY exchanges so the
+        summarizer isn't called on every turn.
+        """
+        history = self.conversation_history
+        window = 2 * config.HISTORY_WINDOW_TURNS
+        if len(history) <= 2 + window + 2 * config.HISTORY_COMPACT_EVERY:
+            return
+
+        has_summary = (
+            history[1]["role"] == "user"
+            and isinstance(history[1]["content"], str)
+            and history[1]["content"].startswith(SUMMARY_PREFIX)
+        )
+        start = 2 if has_summary else 1
+
+        # The kept tail must open on an assistant turn so every tool_result
+        # still follows the tool_use it answers.
+        cut = len(history) - window
+        while cut < len(history) and history[cut]["role"] != "assistant":
+            cut += 1
+        if cut <= start or cut >= len(history):
+            return
+
+        previous = history[1]["content"][len(SUMMARY_PREFIX):].strip() if has_summary else ""
+        summary = self._summarize(previous, history[start:cut])
+
+        # history[0] keeps its cache breakpoint; consecutive user turns are merged by the API
+        history[1:cut] = [{"role": "user", "content": f"{SUMMARY_PREFIX}\n{summary}"}]
+
+    def _summarize(self, previous_summary: str, messages: list[dict]) -> str:
+        """Summarize evicted turns with the cheap summary model."""
+        transcript = "\n".join(_render_message(m) for m in messages)
+        prompt = f"""Summarize this agent work log for the agent to continue from. Keep file paths, decisions made, commands run and their outcomes, and open problems. Be concise.
+
+Earlier summary:
+{previous_summary or "(none)"}
+
+Log:
+{transcript}"""
+
+        try:
+            response = self._create_message({
+                "model": config.SUMMARY_MODEL,
+                "max_tokens": 1024,
+                "messages": [{"role": "user", "content": prompt}]
+            })
+        except anthropic.APIError as e:
+            logger.warning("  [%s] History summary failed, dropping old turns: %s", self.agent_id, e)
+            return f"{previous_summary}\n(Further earlier turns were dropped.)".strip()
+
+        return "".join(b.text for b in response.content if b.type == "text")
+
+    def _request_params(self, messages: list[dict]) -> dict:
+        """Build the messages.create parameters for a conversation."""
+        return {
+            "model": config.MODEL,
+            "max_tokens": self._max_tokens(),
+            "system": [{
+                "type": "text",
+                "text": self.system_prompt,
+                "cache_control": {"type": "ephemeral"}
+            }],
+            "tools": self.tools,
+            "messages": messages
+        }
+
+    def _max_tokens(self) -> int:
+        """
+        Output budget for the next turn: 1.5x the recent average, never below
+        initial_max_tokens (room for a typical write_file) or above the cap.
+        """
+        if self._output_ema is None:
+            estimate = self.initial_max_tokens
+        else:
+            estimate = int(self._output_ema * 1.5)
+        return min(config.MAX_OUTPUT_TOKENS, max(self.initial_max_tokens, estimate))
+
+    def _update_output_ema(self, output_tokens: int):
+        if self._output_ema is None:
+            self._output_ema = float(output_tokens)
+        else:
+            self._output_ema = 0.7 * self._output_ema + 0.3 * output_tokens
+
+    def _prompt_content(self, prompt: str, cache: bool):
+        """User message content for a prompt, optionally ending in a cache breakpoint."""
+        if not cache:
+            return prompt
+        return [{
+            "type": "text",
+            "text": prompt,
+            "cache_control": {"type": "ephemeral"}
+        }]
+
+    def _track_usage(self, response, batched: bool = False):
+        """Add a response's token usage to the agent's running totals."""
+        # Cached prefix tokens are reported separately from input_tokens
+        usage = response.usage
+        cache_read = getattr(usage, "cache_read_input_tokens", 0) or 0
+        cache_creation = getattr(usage, "cache_creation_input_tokens", 0) or 0
+        tokens = usage.input_tokens + usage.output_tokens + cache_read + cache_creation
+        self.total_tokens += tokens
+        self.cache_read_tokens += cache_read
+        if batched:
+            self.batch_tokens += tokens
+
+        if self.on_tokens is not None:
+            # Weight cache traffic the way it's billed: reads at 10%, writes at 125%
+            billed = usage.input_tokens + usage.output_tokens + 0.1 * cache_read + 1.25 * cache_creation
+            self.on_tokens(self.agent_id, round(billed))
+
+    def _execute_tools(self, blocks: list, started: dict[str, Future]) -> list[dict]:
+        """
+        Execute non-terminal tool_use blocks and return their tool_result
+        blocks in the same order. Consecutive read-only tools run together on
+        the agent's thread pool; any other tool waits for everything before it
+        and runs alone, so e.g. a command always sees files written earlier in
+        the turn. Blocks already started while streaming are just awaited.
+        """
+        results = []
+        reads: list[Future] = []  # Read-only tools running since the last other tool
+        for block in blocks:
+            future = started.get(block.id)
+            if block.name in self._READ_ONLY_TOOLS:
+                if future is None:
+                    logger.info("  [%s] Tool: %s", self.agent_id, block.name)
+                    future = self._tool_pool.submit(self._execute_tool_block, block)
+                reads.append(future)
+                continue
+
+            results.extend(read.result() for read in reads)
+            reads = []
+            if future is None:
+                logger.info("  [%s] Tool: %s", self.agent_id, block.name)
+                results.append(self._execute_tool_block(block))
+            else:
+                results.append(future.result())
+        results.extend(read.result() for read in reads)
+        return results
+
+    def _execute_tool_block(self, block) -> dict:
+        """Execute a single tool_use block, turning failures into an error result."""
+        try:
+            return {
+                "type": "tool_result",
+                "tool_use_id": block.id,
+                "content": execute_tool(block.name, block.input)
+            }
+        except Exception as e:
+            return {
+                "type": "tool_result",
+                "tool_use_id": block.id,
+                "content": f"Error executing {block.name}: {str(e)}",
+                "is_error": True
+            }
+
     def continue_with_feedback(self, feedback: str) -> AgentResult:
         """Continue the conversation with feedback (e.g., from QA)."""
         return self.run(feedback)
@@ -1,7 +1,7 @@
 """Coding agent that implements browser components."""
 
 from agents.base import BaseAgent
-from agents.tools import CODING_TOOLS
+from agents.tools import CODING_TOOLS_CACHED
 
 CODING_SYSTEM_PROMPT = """You are an expert Python developer building a web browser. You write clean, working code.
 
@@ -36,11 +36,15 @@ If you encounter issues, debug and fix them - don't give up."""
 class CodingAgent(BaseAgent):
     """Agent that writes browser code."""
 
-    def __init__(self, agent_id: str):
+    text_completion_tool = "task_complete"
+
+    def __init__(self, agent_id: str, on_tokens=None, stop_event=None):
         super().__init__(
             agent_id=agent_id,
             system_prompt=CODING_SYSTEM_PROMPT,
-            tools=CODING_TOOLS
+            tools=CODING_TOOLS_CACHED,
+            on_tokens=on_tokens,
+            stop_event=stop_event
         )
 
     def work_on_task(self, task_name: str, task_description: str):
@@ -1,7 +1,7 @@
 """QA agent that tests browser implementations."""
 
 from agents.base import BaseAgent
-from agents.tools import QA_TOOLS
+from agents.tools import QA_TOOLS_CACHED
 
 QA_SYSTEM_PROMPT = """You are a QA engineer testing a web browser being built in Python with PyQt6.
 
@@ -41,12 +41,21 @@ After testing, call either:
 class QAAgent(BaseAgent):
     """Agent that tests browser implementations."""
 
-    def __init__(self, agent_id: str = "qa-agent"):
+    # Review turns are mostly short tool calls and approve/reject verdicts
+    initial_max_tokens = 2048
+
+    def __init__(self, agent_id: str = "qa-agent", use_batch_api: bool = False,
+                 on_tokens=None, stop_event=None):
         super().__init__(
             agent_id=agent_id,
             system_prompt=QA_SYSTEM_PROMPT,
-            tools=QA_TOOLS
+            tools=QA_TOOLS_CACHED,
+            on_tokens=on_tokens,
+            stop_event=stop_event
         )
+        # Reviews aren't latency-critical, so the opening turn can be batched
+        # at half price; follow-up tool turns stay synchronous.
+        self.use_batch_api = use_batch_api
 
     def review_task(self, task_name: str, task_description: str, completion_summary: str):
         """Review a completed task."""
@@ -67,4 +76,4 @@ Please review this implementation:
 4. Test the functionality
 5. Call approve or reject based on your findings"""
 
-        return self.run(prompt)
+        return self.run(prompt, use_batch=self.use_batch_api)
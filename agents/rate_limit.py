@@ -0,0 +1,58 @@
+"""Proactive rate limiting for Anthropic API calls shared by all agents."""
+
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Token-bucket admission control over requests/minute and input tokens/minute.
+    Callers block in acquire() until both buckets have room, instead of
+    submitting and retrying after a 429.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._available_requests = float(requests_per_minute)
+        self._available_tokens = float(tokens_per_minute)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._available_requests = min(
+            self.requests_per_minute,
+            self._available_requests + elapsed * self.requests_per_minute / 60
+        )
+        self._available_tokens = min(
+            self.tokens_per_minute,
+            self._available_tokens + elapsed * self.tokens_per_minute / 60
+        )
+
+    def acquire(self, tokens: int):
+        """Block until one request carrying `tokens` input tokens may be sent."""
+        # A single request larger than the whole bucket must still get through
+        tokens = min(tokens, self.tokens_per_minute)
+        while True:
+            with self._lock:
+                self._refill()
+                if self._available_requests >= 1 and self._available_tokens >= tokens:
+                    self._available_requests -= 1
+                    self._available_tokens -= tokens
+                    return
+                wait = max(
+                    (1 - self._available_requests) * 60 / self.requests_per_minute,
+                    (tokens - self._available_tokens) * 60 / self.tokens_per_minute
+                )
+            time.sleep(wait)
+
+    def reconcile(self, estimated_tokens: int, actual_tokens: int):
+        """Correct the token bucket once the real input token count is known."""
+        with self._lock:
+            self._available_tokens = min(
+                self.tokens_per_minute,
+                self._available_tokens + estimated_tokens - actual_tokens
+            )
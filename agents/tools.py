@@ -1,7 +1,13 @@
 """Tool definitions and implementations for agents."""
 
+import copy
+import functools
 import os
+import select
+import signal
 import subprocess
+import threading
+import time
 from pathlib import Path
 from typing import Any
 import config
@@ -158,32 +164,67 @@ QA_TOOLS = [
 ]
 
 
+def _with_cache_breakpoint(tools: list[dict]) -> list[dict]:
+    """Deep copy of a tool list with a prompt-cache breakpoint on the last tool."""
+    tools = copy.deepcopy(tools)
+    tools[-1]["cache_control"] = {"type": "ephemeral"}
+    return tools
+
+
+# Built once at import and shared by every agent of a kind; treat as read-only
+CODING_TOOLS_CACHED = _with_cache_breakpoint(CODING_TOOLS)
+QA_TOOLS_CACHED = _with_cache_breakpoint(QA_TOOLS)
+
+# Read-only tool results are cached by file/dir stat signature plus a
+# generation counter that every mutating tool bumps, so repeated reads across
+# turns and agents skip the disk while writes are always visible.
+_cache_generation = 0
+_cache_generation_lock = threading.Lock()
+
+
+def _bump_cache_generation():
+    global _cache_generation
+    with _cache_generation_lock:
+        _cache_generation += 1
+
+
+_DISPATCH = {
+    "read_file": lambda i, d: _read_file(d, i["path"]),
+    "write_file": lambda i, d: _write_file(d, i["path"], i["content"]),
+    "list_files": lambda i, d: _list_files(d, i["path"]),
+    "run_command": lambda i, d: _run_command(d, i["command"]),
+    "task_complete": lambda i, d: f"Task marked complete: {i['summary']}",
+    "approve": lambda i, d: f"APPROVED: {i['reason']}",
+    "reject": lambda i, d: f"REJECTED: {i['issues']}",
+}
+
+# Substrings that get a run_command rejected outright
+_DANGEROUS = ("rm -rf", "sudo", "> /", "| sh", "| bash", "wget", "curl")
+
+
 def execute_tool(tool_name: str, tool_input: dict[str, Any], browser_dir: Path = None) -> str:
     """Execute a tool and return the result as a string."""
     if browser_dir is None:
         browser_dir = config.BROWSER_DIR
 
+    handler = _DISPATCH.get(tool_name)
+    if handler is None:
+        return f"Unknown tool: {tool_name}"
     try:
-        if tool_name == "read_file":
-            return _read_file(browser_dir, tool_input["path"])
-        elif tool_name == "write_file":
-            return _write_file(browser_dir, tool_input["path"], tool_input["content"])
-        elif tool_name == "list_files":
-            return _list_files(browser_dir, tool_input["path"])
-        elif tool_name == "run_command":
-            return _run_command(browser_dir, tool_input["command"])
-        elif tool_name == "task_complete":
-            return f"Task marked complete: {tool_input['summary']}"
-        elif tool_name == "approve":
-            return f"APPROVED: {tool_input['reason']}"
-        elif tool_name == "reject":
-            return f"REJECTED: {tool_input['issues']}"
-        else:
-            return f"Unknown tool: {tool_name}"
+        return handler(tool_input, browser_dir)
     except Exception as e:
         return f"Error executing {tool_name}: {str(e)}"
 
 
+def _is_within(browser_dir: Path, file_path: Path) -> bool:
+    """Check that file_path resolves to somewhere inside browser_dir."""
+    if browser_dir == config.BROWSER_DIR:
+        root = str(config.BROWSER_DIR_RESOLVED)
+    else:
+        root = str(browser_dir.resolve())
+    return os.path.commonpath([str(file_path.resolve(strict=False)), root]) == root
+
+
 def _read_file(browser_dir: Path, path: str) -> str:
     """Read a file from the browser directory."""
     file_path = browser_dir / path
@@ -192,12 +233,20 @@ def _read_file(browser_dir: Path, path: str) -> str:
     if not file_path.is_file():
         return f"Error: Not a file: {path}"
     # Security: ensure we're still within browser_dir
-    try:
-        file_path.resolve().relative_to(browser_dir.resolve())
-    except ValueError:
+    if not _is_within(browser_dir, file_path):
         return "Error: Access denied - path outside browser directory"
 
-    content = file_path.read_text()
+    stat = file_path.stat()
+    return _read_file_cached(file_path, stat.st_mtime_ns, stat.st_size, _cache_generation)
+
+
+@functools.lru_cache(maxsize=256)
+def _read_file_cached(file_path: Path, mtime_ns: int, size: int, generation: int) -> str:
+    limit = config.MAX_READ_FILE_BYTES
+    with open(file_path, "rb") as f:
+        content = f.read(limit).decode("utf-8", errors="replace")
+    if size > limit:
+        content += f"\n...[TRUNCATED: file is {size} bytes, showing first {limit}]"
     return content if content else "(empty file)"
 
 
@@ -206,15 +255,16 @@ def _write_file(browser_dir: Path, path: str, content: str) -> str:
     file_path = browser_dir / path
 
     # Security: ensure we're still within browser_dir
-    try:
-        file_path.resolve().relative_to(browser_dir.resolve())
-    except ValueError:
+    if not _is_within(browser_dir, file_path):
         return "Error: Access denied - path outside browser directory"
 
     # Create parent directories
     file_path.parent.mkdir(parents=True, exist_ok=True)
 
-    file_path.write_text(content)
+    try:
+        file_path.write_text(content)
+    finally:
+        _bump_cache_generation()
     return f"Successfully wrote {len(content)} bytes to {path}"
 
 
@@ -226,12 +276,21 @@ def _list_files(browser_dir: Path, path: str) -> str:
     if not dir_path.is_dir():
         return f"Error: Not a directory: {path}"
 
+    return _list_files_cached(dir_path, dir_path.stat().st_mtime_ns, _cache_generation)
+
+
+@functools.lru_cache(maxsize=256)
+def _list_files_cached(dir_path: Path, mtime_ns: int, generation: int) -> str:
+    # scandir's DirEntry answers is_dir from the directory read itself
+    with os.scandir(dir_path) as it:
+        dir_entries = sorted(it, key=lambda e: e.name)
+
     entries = []
-    for entry in sorted(dir_path.iterdir()):
-        if entry.is_dir():
+    for entry in dir_entries:
+        if entry.is_dir(follow_symlinks=False):
             entries.append(f"[DIR]  {entry.name}/")
         else:
-            size = entry.stat().st_size
+            size = entry.stat(follow_symlinks=False).st_size
             entries.append(f"[FILE] {entry.name} ({size} bytes)")
 
     if not entries:
@@ -240,34 +299,91 @@ def _list_files(browser_dir: Path, path: str) -> str:
 
 
 def _run_command(browser_dir: Path, command: str) -> str:
-    """Run a shell command in the browser directory."""
+    """
+    Run a shell command in the browser directory. Output is read as it is
+    produced and only the first and last MAX_COMMAND_OUTPUT_BYTES / 2 bytes are
+    kept, so chatty commands don't balloon memory or the next prompt.
+    """
     # Security: basic command sanitization
-    dangerous = ["rm -rf", "sudo", "> /", "| sh", "| bash", "wget", "curl"]
-    for d in dangerous:
-        if d in command.lower():
-            return f"Error: Command blocked for safety: {command}"
+    lower = command.lower()
+    if any(d in lower for d in _DANGEROUS):
+        return f"Error: Command blocked for safety: {command}"
 
     try:
-        result = subprocess.run(
+        proc = subprocess.Popen(
             command,
             shell=True,
             cwd=str(browser_dir),
-            capture_output=True,
-            text=True,
-            timeout=60,
-            env={**os.environ, "PYTHONPATH": str(browser_dir)}
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            env={**os.environ, "PYTHONPATH": str(browser_dir), "PYTHONDONTWRITEBYTECODE": "1"},
+            start_new_session=True  # So a timeout can kill the whole process group
         )
+    except Exception as e:
+        return f"Error running command: {str(e)}"
 
-        output = ""
-        if result.stdout:
-            output += f"STDOUT:\n{result.stdout}\n"
-        if result.stderr:
-            output += f"STDERR:\n{result.stderr}\n"
-        output += f"Exit code: {result.returncode}"
-
-        return output if output.strip() else "(no output)"
+    half = config.MAX_COMMAND_OUTPUT_BYTES // 2
+    head = bytearray()
+    tail = bytearray()
+    total = 0
+    deadline = time.monotonic() + 60
+    fd = proc.stdout.fileno()
 
-    except subprocess.TimeoutExpired:
-        return "Error: Command timed out after 60 seconds"
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                _kill_process_group(proc)
+                return "Error: Command timed out after 60 seconds"
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if not ready:
+                continue
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                break
+            total += len(chunk)
+            if len(head) < half:
+                take = half - len(head)
+                head += chunk[:take]
+                chunk = chunk[take:]
+            tail += chunk
+            if len(tail) > half:
+                del tail[:-half]
+        # A child that closed stdout (or was redirected) can outlive EOF
+        try:
+            returncode = proc.wait(timeout=max(0, deadline - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            _kill_process_group(proc)
+            return "Error: Command timed out after 60 seconds"
     except Exception as e:
+        _kill_process_group(proc)
         return f"Error running command: {str(e)}"
+    finally:
+        proc.stdout.close()
+        # The command may have changed any file
+        _bump_cache_generation()
+
+    output = ""
+    if total:
+        text = head.decode("utf-8", errors="replace")
+        omitted = total - len(head) - len(tail)
+        if omitted > 0:
+            text += f"\n...[TRUNCATED {omitted} bytes]...\n"
+        text += tail.decode("utf-8", errors="replace")
+        output += f"OUTPUT:\n{text}\n"
+    output += f"Exit code: {returncode}"
+
+    return output if output.strip() else "(no output)"
+
+
+def _kill_process_group(proc: subprocess.Popen):
+    """SIGTERM the command's process group, escalating to SIGKILL if it lingers."""
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+        try:
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            os.killpg(proc.pid, signal.SIGKILL)
+            proc.wait()
+    except ProcessLookupError:
+        pass
@@ -6,20 +6,36 @@ from pathlib import Path
 # Paths
 PROJECT_ROOT = Path(__file__).parent
 BROWSER_DIR = PROJECT_ROOT / "browser"
+BROWSER_DIR_RESOLVED = BROWSER_DIR.resolve()
 DATA_DIR = PROJECT_ROOT / "data"
 STATE_DB_PATH = DATA_DIR / "state.db"
 
-# Ensure directories exist
-BROWSER_DIR.mkdir(exist_ok=True)
-DATA_DIR.mkdir(exist_ok=True)
+
+def ensure_dirs():
+    """Create the browser and data directories. Called once at orchestrator startup."""
+    BROWSER_DIR.mkdir(exist_ok=True)
+    DATA_DIR.mkdir(exist_ok=True)
+
 
 # API Configuration
 ANTHROPIC_API_KEY = os.environ.get("ANTHROPIC_API_KEY")
 MODEL = "claude-sonnet-4-20250514"
+MAX_OUTPUT_TOKENS = 8096  # Upper bound for the per-turn max_tokens budget
+SUMMARY_MODEL = "claude-3-5-haiku-20241022"  # Cheap model for compacting old turns
+ANTHROPIC_RPM = 40  # Requests/minute across all agents (~80% of tier limit)
+ANTHROPIC_TPM = 80_000  # Input tokens/minute across all agents (~80% of tier limit)
 
 # Agent Configuration
 NUM_CODING_AGENTS = 3
 MAX_AGENT_TURNS = 50  # Max back-and-forth per task
+AUTO_TERMINAL_FROM_TEXT = True  # Accept "I'm done" text as task_complete after a few turns
+QA_USE_BATCH_API = False  # Send the first QA review turn through the Message Batches API
+BATCH_POLL_INTERVAL = 20  # Seconds between batch status polls
+HISTORY_WINDOW_TURNS = 6  # Recent exchanges kept verbatim in conversation history
+HISTORY_COMPACT_EVERY = 4  # Summarize old turns once this many exchanges pile up
+MAX_READ_FILE_BYTES = 512 * 1024  # read_file returns at most this much of a file
+MAX_COMMAND_OUTPUT_BYTES = 8192  # Head + tail of run_command output returned to agents
+TOOL_CONCURRENCY_LIMIT = int(os.environ.get("TOOL_CONCURRENCY_LIMIT", 4))  # Parallel read-only tool calls per turn
 
 # Circuit Breaker Settings
 MAX_TASK_RETRIES = 3
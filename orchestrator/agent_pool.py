@@ -0,0 +1,33 @@
+"""Pool of coding agents that are reused across tasks."""
+
+from contextlib import contextmanager
+
+from agents.coding import CodingAgent
+
+
+class AgentPool:
+    """
+    Hands out coding agents one task at a time. Agents are created once and
+    recycled: acquiring one clears its conversation in place instead of
+    building new agent state for every task.
+    """
+
+    def __init__(self, agents: dict[str, CodingAgent]):
+        self._agents = agents
+        self._in_use: set[str] = set()
+
+    @contextmanager
+    def acquire(self, agent_id: str):
+        """Take an agent with an empty conversation; it's released when the block exits."""
+        if agent_id in self._in_use:
+            raise RuntimeError(f"Agent {agent_id} is already in use")
+        agent = self._agents[agent_id]
+        agent.reset_conversation()
+        self._in_use.add(agent_id)
+        try:
+            yield agent
+        finally:
+            self.release(agent_id)
+
+    def release(self, agent_id: str):
+        self._in_use.discard(agent_id)
@@ -3,7 +3,7 @@
 from dataclasses import dataclass
 from enum import Enum
 import config
-from orchestrator.state import StateManager
+from orchestrator.state import StateManager, TaskStatus
 
 
 class SystemStatus(Enum):
@@ -48,11 +48,11 @@ class CircuitBreaker:
             )
 
         # Check if all tasks completed
-        all_tasks = self.state.get_all_tasks()
-        if all_tasks:
-            completed = sum(1 for t in all_tasks if t.status.value == "completed")
-            blocked = sum(1 for t in all_tasks if t.status.value == "blocked")
-            total = len(all_tasks)
+        counts = self.state.get_task_status_counts()
+        total = sum(counts.values())
+        if total:
+            completed = counts[TaskStatus.COMPLETED]
+            blocked = counts[TaskStatus.BLOCKED]
 
             if completed + blocked == total:
                 if blocked == 0:
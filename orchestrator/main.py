@@ -1,11 +1,13 @@
 """Main orchestrator that coordinates agents to build the browser."""
 
-import time
+import asyncio
+import threading
 from pathlib import Path
 
 import config
 from orchestrator.state import StateManager, TaskStatus, AgentStatus
 from orchestrator.task_queue import initialize_tasks
+from orchestrator.agent_pool import AgentPool
 from orchestrator.circuit_breaker import CircuitBreaker, SystemStatus
 from agents.coding import CodingAgent
 from agents.qa import QAAgent
@@ -15,42 +17,92 @@ class Orchestrator:
     """Main orchestrator that coordinates browser development."""
 
     def __init__(self, resume: bool = False):
+        config.ensure_dirs()
         self.state = StateManager(config.STATE_DB_PATH)
         self.circuit_breaker = CircuitBreaker(self.state)
         self.coding_agents: dict[str, CodingAgent] = {}
+        self.agent_pool: AgentPool = None
         self.qa_agent: QAAgent = None
+        self._dispatched: set[int] = set()  # Ids of tasks queued, being worked on or in review
+        # Set when the run stops; agents finish their current API call and return
+        self.stop_event = threading.Event()
         self.resume = resume
 
         self._setup_agents()
         if not resume:
             initialize_tasks(self.state)
+        else:
+            self._report_resume()
+            requeued = self.state.requeue_inflight_tasks()
+            if requeued:
+                print(f"Requeued {requeued} task(s) left in progress by the interrupted run")
 
     def _setup_agents(self):
         """Initialize all agents."""
         # Create coding agents
         for i in range(config.NUM_CODING_AGENTS):
             agent_id = f"coding-{i+1}"
-            self.coding_agents[agent_id] = CodingAgent(agent_id)
+            self.coding_agents[agent_id] = CodingAgent(
+                agent_id,
+                on_tokens=self.state.add_agent_tokens,
+                stop_event=self.stop_event
+            )
             self.state.register_agent(agent_id, "coding")
+        self.agent_pool = AgentPool(self.coding_agents)
 
         # Create QA agent
-        self.qa_agent = QAAgent("qa-agent")
+        self.qa_agent = QAAgent(
+            "qa-agent",
+            use_batch_api=config.QA_USE_BATCH_API,
+            on_tokens=self.state.add_agent_tokens,
+            stop_event=self.stop_event
+        )
         self.state.register_agent("qa-agent", "qa")
 
         print(f"Initialized {len(self.coding_agents)} coding agents and 1 QA agent")
 
-    def run(self, dry_run: bool = False):
-        """Main orchestration loop."""
+    def _report_resume(self):
+        """Print where the last checkpoint left off."""
+        checkpoint = self.state.get_latest_checkpoint()
+        if checkpoint is None:
+            print("No checkpoint found, resuming from current task state")
+            return
+        print(f"Resuming from checkpoint at {checkpoint.timestamp}: "
+              f"{checkpoint.completed_tasks} tasks completed, {checkpoint.total_tokens:,} tokens used")
+
+    async def run(self):
+        """
+        Main orchestration loop. Coding and QA run as a pipeline: each coding
+        agent runs its own worker pulling from a shared ready queue and hands
+        finished work to a single QA worker, so a coder starts its next task
+        while the last one is in review. This loop dispatches every task whose
+        dependencies are met and sleeps until a task changes status.
+        """
         print("\n" + "="*60)
         print("BROWSER DEVELOPMENT ORCHESTRATOR")
         print("="*60)
 
-        if dry_run:
-            self._show_plan()
-            return
+        try:
+            await self._run()
+        except asyncio.CancelledError:
+            # Ctrl-C: asyncio.run waits for agent threads, so tell them to stop
+            self.stop_event.set()
+            raise
 
+    async def _run(self):
         self.state.log("orchestrator_started", f"Resume={self.resume}")
 
+        # Items are (task, rework): rework is None for a fresh task, or
+        # (issues, conversation history) for one QA sent back to be fixed
+        ready: asyncio.Queue = asyncio.Queue()
+        # Items are (task, coding agent id, completion summary, conversation history)
+        reviews: asyncio.Queue = asyncio.Queue()
+        workers = [
+            asyncio.create_task(self._worker(agent_id, ready, reviews))
+            for agent_id in self.coding_agents
+        ]
+        workers.append(asyncio.create_task(self._qa_worker(reviews, ready)))
+
         while True:
             # Check circuit breakers
             status = self.circuit_breaker.check()
@@ -58,142 +110,224 @@ class Orchestrator:
                 self._handle_stop(status)
                 break
 
-            # Get next task
-            task = self.state.get_next_pending_task()
-            if task is None:
-                # No pending tasks - check if we're done or stuck
-                all_tasks = self.state.get_all_tasks()
-                in_progress = [t for t in all_tasks if t.status in
-                              (TaskStatus.IN_PROGRESS, TaskStatus.IN_QA)]
-                if in_progress:
-                    print("Waiting for in-progress tasks...")
-                    time.sleep(5)
-                    continue
-                else:
-                    print("\nNo more tasks to process!")
-                    break
+            # Queue every task that has become ready
+            self.state.status_changed.clear()
+            for task in self.state.take_ready_tasks():
+                if task.id not in self._dispatched:
+                    self._dispatched.add(task.id)
+                    ready.put_nowait((task, None))
 
-            # Process the task
-            self._process_task(task)
+            # Nothing queued or running - check if we're done or stuck
+            if not self._dispatched:
+                print("\nNo more tasks to process!")
+                break
 
-            # Checkpoint if needed
-            if self.circuit_breaker.should_checkpoint():
-                self.state.create_checkpoint(f"Checkpoint at task {task.id}")
-                print(f"[Checkpoint created]")
+            await self.state.status_changed.wait()
+
+        # Drop work nobody has started and wait for running agents to return
+        # at their next turn; interrupted tasks are redone from scratch on resume
+        while not ready.empty():
+            task, rework = ready.get_nowait()
+            if rework is not None:
+                self.state.update_task_status(task.id, TaskStatus.PENDING)
+            self._dispatched.discard(task.id)
+        if self._dispatched:
+            print(f"Waiting for {len(self._dispatched)} in-flight task(s) to finish...")
+        while self._dispatched:
+            self.state.status_changed.clear()
+            await self.state.status_changed.wait()
+        for worker in workers:
+            worker.cancel()
 
         self._print_summary()
 
-    def _process_task(self, task):
-        """Process a single task through coding and QA."""
+    async def _worker(self, agent_id: str, ready: asyncio.Queue, reviews: asyncio.Queue):
+        """
+        Take ready tasks off the queue one at a time with a single coding
+        agent, and hand finished work to QA without waiting for the review.
+        """
+        while True:
+            task, rework = await ready.get()
+            in_review = False
+            try:
+                with self.agent_pool.acquire(agent_id) as agent:
+                    if rework is None:
+                        self._assign_task(task, agent)
+                        result = await self._code(task, agent)
+                    else:
+                        result = await self._fix(task, agent, *rework)
+                    if result is not None:
+                        history = list(agent.conversation_history)
+                        reviews.put_nowait((task, agent_id, result.message, history))
+                        in_review = True
+                    elif rework is not None:
+                        # The fix itself failed; count it as another rejection
+                        in_review = self._retry_fix(task, rework[0], rework[1], ready)
+            except Exception as e:
+                print(f"[{agent_id}] Error on task {task.id}: {e}")
+                self._handle_task_failure(task, str(e), agent_id)
+            finally:
+                if not in_review:
+                    self._dispatched.discard(task.id)
+                # Wake the dispatch loop even if the task's status didn't change
+                self.state.status_changed.set()
+            self.state.flush_tokens()
+
+    def _assign_task(self, task, agent: CodingAgent):
+        """Mark a task and the coding agent taking it as working."""
         print(f"\n{'='*60}")
         print(f"TASK {task.id}: {task.name}")
         print(f"Component: {task.component}")
         print(f"{'='*60}")
 
-        # Find an available coding agent
-        agent_id = self.state.get_idle_coding_agent()
-        if not agent_id:
-            # All agents busy - this shouldn't happen in sequential mode
-            agent_id = list(self.coding_agents.keys())[0]
-
-        agent = self.coding_agents[agent_id]
-        agent.reset_conversation()
+        agent_id = agent.agent_id
 
         # Update state
-        self.state.update_task_status(task.id, TaskStatus.IN_PROGRESS, agent_id)
-        self.state.update_agent_status(agent_id, AgentStatus.WORKING, task.id)
-        self.state.log("task_started", f"Task '{task.name}' assigned to {agent_id}", agent_id)
-
+        task.assigned_agent = agent_id
+        with self.state.transaction():
+            self.state.update_task_status(task.id, TaskStatus.IN_PROGRESS, agent_id)
+            self.state.update_agent_status(agent_id, AgentStatus.WORKING, task.id)
+            self.state.log("task_started", f"Task '{task.name}' assigned to {agent_id}", agent_id)
+
+    async def _code(self, task, agent: CodingAgent):
+        """Have the coding agent do the task. Returns its result, or None if it failed."""
+        agent_id = agent.agent_id
         print(f"\n[{agent_id}] Working on task...")
 
-        # Coding agent works on the task
-        result = agent.work_on_task(task.name, task.description)
-        self.state.add_agent_tokens(agent_id, result.tokens_used)
+        result = await asyncio.to_thread(agent.work_on_task, task.name, task.description)
 
         if not result.success:
+            if self.stop_event.is_set():
+                self._requeue_stopped(task, agent_id)
+                return None
             print(f"[{agent_id}] Failed to complete task: {result.message}")
-            self._handle_task_failure(task, result.message)
-            return
+            self._handle_task_failure(task, result.message, agent_id)
+            return None
 
         print(f"[{agent_id}] Completed: {result.message}")
-
-        # Send to QA
-        self.state.update_task_status(task.id, TaskStatus.IN_QA, agent_id)
-        self.state.update_agent_status(agent_id, AgentStatus.WAITING_QA, task.id)
-        self.qa_agent.reset_conversation()
-
-        print(f"\n[qa-agent] Reviewing task...")
-
-        qa_result = self.qa_agent.review_task(task.name, task.description, result.message)
-        self.state.add_agent_tokens("qa-agent", qa_result.tokens_used)
-
-        if qa_result.tool_name == "approve":
-            print(f"[qa-agent] APPROVED: {qa_result.message}")
-            self.state.update_task_status(task.id, TaskStatus.COMPLETED, agent_id)
+        self._hand_to_qa(task, agent_id)
+        return result
+
+    async def _fix(self, task, agent: CodingAgent, issues: str, history: list[dict]):
+        """
+        Have a coding agent fix issues QA found, continuing the conversation
+        the task was coded in. Returns the result, or None if the fix failed.
+        """
+        agent_id = agent.agent_id
+        print(f"\n[{agent_id}] Fixing issues in task {task.id} (retry {task.retries})...")
+
+        task.assigned_agent = agent_id
+        with self.state.transaction():
+            self.state.update_task_status(task.id, TaskStatus.IN_PROGRESS, agent_id)
+            self.state.update_agent_status(agent_id, AgentStatus.WORKING, task.id)
+
+        agent.conversation_history.extend(history)
+        result = await asyncio.to_thread(agent.fix_issues, issues)
+        if not result.success:
+            with self.state.transaction():
+                self.state.update_task_status(task.id, TaskStatus.IN_QA, agent_id)
+                self.state.update_agent_status(agent_id, AgentStatus.IDLE)
+            return None
+
+        self._hand_to_qa(task, agent_id)
+        return result
+
+    def _hand_to_qa(self, task, agent_id: str):
+        """Mark a task as in review; its coding agent is free for the next task."""
+        with self.state.transaction():
+            self.state.update_task_status(task.id, TaskStatus.IN_QA, agent_id)
             self.state.update_agent_status(agent_id, AgentStatus.IDLE)
-            self.state.log("task_completed", f"Task '{task.name}' approved", agent_id)
-
-        elif qa_result.tool_name == "reject":
-            print(f"[qa-agent] REJECTED: {qa_result.message}")
-            self._handle_qa_rejection(task, agent, qa_result.message)
-
-        else:
-            # QA didn't call approve or reject properly
-            print(f"[qa-agent] Unclear result, treating as rejection")
-            self._handle_qa_rejection(task, agent, "QA review incomplete")
-
-    def _handle_qa_rejection(self, task, agent, issues: str):
-        """Handle a QA rejection - retry or block the task."""
-        can_retry = self.circuit_breaker.handle_task_failure(task.id)
-
-        if can_retry:
-            print(f"\n[{agent.agent_id}] Fixing issues (retry {task.retries + 1})...")
-
-            # Have the coding agent fix the issues
-            fix_result = agent.fix_issues(issues)
-            self.state.add_agent_tokens(agent.agent_id, fix_result.tokens_used)
-
-            if fix_result.success:
-                # Re-run QA
-                self.qa_agent.reset_conversation()
-                qa_result = self.qa_agent.review_task(
-                    task.name, task.description, fix_result.message
-                )
-                self.state.add_agent_tokens("qa-agent", qa_result.tokens_used)
 
+    async def _qa_worker(self, reviews: asyncio.Queue, ready: asyncio.Queue):
+        """Review finished work one task at a time with the QA agent."""
+        while True:
+            task, agent_id, summary, history = await reviews.get()
+            done = True
+            try:
+                qa_result = await self._review(task, summary)
                 if qa_result.tool_name == "approve":
-                    print(f"[qa-agent] APPROVED after fix: {qa_result.message}")
-                    self.state.update_task_status(task.id, TaskStatus.COMPLETED, agent.agent_id)
-                    self.state.update_agent_status(agent.agent_id, AgentStatus.IDLE)
-                    self.state.log("task_completed", f"Task '{task.name}' approved after retry")
-                    return
-
-            # Still failing - recursive retry handling
-            updated_task = self.state.get_task(task.id)
-            if updated_task.retries < config.MAX_TASK_RETRIES:
-                self._handle_qa_rejection(updated_task, agent, qa_result.message if 'qa_result' in dir() else issues)
-            else:
-                self._block_task(task)
-        else:
+                    print(f"[qa-agent] APPROVED: {qa_result.message}")
+                    with self.state.transaction():
+                        self.state.update_task_status(task.id, TaskStatus.COMPLETED, agent_id)
+                        self.state.log("task_completed", f"Task '{task.name}' approved", agent_id)
+
+                    # Checkpoint if needed
+                    if self.circuit_breaker.should_checkpoint():
+                        self.state.create_checkpoint(f"Checkpoint at task {task.id}")
+                        print(f"[Checkpoint created]")
+                elif qa_result.tool_name != "reject" and self.stop_event.is_set():
+                    print(f"[qa-agent] Review of task {task.id} stopped")
+                    self._requeue_stopped(task)
+                else:
+                    if qa_result.tool_name == "reject":
+                        print(f"[qa-agent] REJECTED: {qa_result.message}")
+                        issues = qa_result.message
+                    else:
+                        # QA didn't call approve or reject properly
+                        print(f"[qa-agent] Unclear result, treating as rejection")
+                        issues = "QA review incomplete"
+                    done = not self._retry_fix(task, issues, history, ready)
+            except Exception as e:
+                print(f"[qa-agent] Error on task {task.id}: {e}")
+                self._handle_task_failure(task, str(e))
+            finally:
+                if done:
+                    self._dispatched.discard(task.id)
+                self.state.status_changed.set()
+
+    async def _review(self, task, completion_summary: str):
+        """Run a QA review."""
+        print(f"\n[qa-agent] Reviewing task {task.id}...")
+        self.qa_agent.reset_conversation()
+        return await asyncio.to_thread(
+            self.qa_agent.review_task, task.name, task.description, completion_summary
+        )
+
+    def _retry_fix(self, task, issues: str, history: list[dict], ready: asyncio.Queue) -> bool:
+        """
+        Queue a rejected task to be fixed if it has retries left, otherwise
+        block it. Returns whether the task was queued.
+        """
+        if self.stop_event.is_set():
+            # No more work is being started, and a review or fix cut short
+            # by the stop doesn't count as a retry
+            self._requeue_stopped(task)
+            return False
+        if not self.circuit_breaker.handle_task_failure(task.id):
             self._block_task(task)
-
-    def _block_task(self, task):
-        """Mark a task as blocked."""
-        self.state.update_task_status(task.id, TaskStatus.BLOCKED)
-        self.state.update_agent_status(task.assigned_agent, AgentStatus.IDLE)
-        self.state.log("task_blocked", f"Task '{task.name}' blocked after max retries")
+            return False
+        task = self.state.get_task(task.id)
+        ready.put_nowait((task, (issues, history)))
+        return True
+
+    def _requeue_stopped(self, task, agent_id: str = None):
+        """Put a task interrupted by a stop back to pending so it's redone on resume."""
+        with self.state.transaction():
+            self.state.update_task_status(task.id, TaskStatus.PENDING)
+            if agent_id:
+                self.state.update_agent_status(agent_id, AgentStatus.IDLE)
+
+    def _block_task(self, task, agent_id: str = None):
+        """Mark a task as blocked, and its coding agent idle if one is still on it."""
+        with self.state.transaction():
+            self.state.update_task_status(task.id, TaskStatus.BLOCKED)
+            if agent_id:
+                self.state.update_agent_status(agent_id, AgentStatus.IDLE)
+            self.state.log("task_blocked", f"Task '{task.name}' blocked after max retries")
         print(f"[BLOCKED] Task '{task.name}' blocked after {config.MAX_TASK_RETRIES} retries")
 
-    def _handle_task_failure(self, task, error: str):
-        """Handle a task that failed during coding (not QA)."""
+    def _handle_task_failure(self, task, error: str, agent_id: str = None):
+        """Handle a task that failed with an error or during coding (not a QA rejection)."""
         self.state.log("task_error", f"Task '{task.name}' error: {error}", task.assigned_agent)
         can_retry = self.circuit_breaker.handle_task_failure(task.id)
         if not can_retry:
-            self._block_task(task)
+            self._block_task(task, agent_id)
         else:
             # Reset task to pending for retry
-            self.state.update_task_status(task.id, TaskStatus.PENDING)
-            self.state.update_agent_status(task.assigned_agent, AgentStatus.IDLE)
+            with self.state.transaction():
+                self.state.update_task_status(task.id, TaskStatus.PENDING)
+                if agent_id:
+                    self.state.update_agent_status(agent_id, AgentStatus.IDLE)
 
     def _handle_stop(self, status):
         """Handle orchestrator stopping."""
@@ -205,38 +339,22 @@ class Orchestrator:
         print(f"{'='*60}")
 
         self.state.log("orchestrator_stopped", status.reason)
-
-    def _show_plan(self):
-        """Show the task plan without executing."""
-        print("\nTASK PLAN (dry run):")
-        print("-" * 40)
-
-        tasks = self.state.get_all_tasks()
-        if not tasks:
-            initialize_tasks(self.state)
-            tasks = self.state.get_all_tasks()
-
-        for task in tasks:
-            deps = f" (depends on: {task.dependencies})" if task.dependencies else ""
-            print(f"{task.id}. [{task.component}] {task.name}{deps}")
-            print(f"   Status: {task.status.value}")
-
-        print("-" * 40)
-        print(f"Total tasks: {len(tasks)}")
+        self.stop_event.set()
 
     def _print_summary(self):
         """Print final summary."""
-        tasks = self.state.get_all_tasks()
-        completed = sum(1 for t in tasks if t.status == TaskStatus.COMPLETED)
-        blocked = sum(1 for t in tasks if t.status == TaskStatus.BLOCKED)
-        pending = sum(1 for t in tasks if t.status == TaskStatus.PENDING)
+        counts = self.state.get_task_status_counts()
+        total = sum(counts.values())
+        completed = counts[TaskStatus.COMPLETED]
+        blocked = counts[TaskStatus.BLOCKED]
+        pending = counts[TaskStatus.PENDING]
 
         tokens = self.state.get_total_tokens_used()
 
         print(f"\n{'='*60}")
         print("FINAL SUMMARY")
         print(f"{'='*60}")
-        print(f"Tasks completed: {completed}/{len(tasks)}")
+        print(f"Tasks completed: {completed}/{total}")
         print(f"Tasks blocked:   {blocked}")
         print(f"Tasks pending:   {pending}")
         print(f"Total tokens:    {tokens:,}")
@@ -1,24 +1,30 @@
 """SQLite-based state management for persistent orchestrator state."""
 
+import asyncio
 import sqlite3
-import json
+import threading
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 from typing import Optional
-from dataclasses import dataclass, asdict
-from enum import Enum
+from dataclasses import dataclass, asdict, replace
+from enum import IntEnum
 
-class TaskStatus(Enum):
-    PENDING = "pending"
-    IN_PROGRESS = "in_progress"
-    IN_QA = "in_qa"
-    BLOCKED = "blocked"
-    COMPLETED = "completed"
+import orjson
 
-class AgentStatus(Enum):
-    IDLE = "idle"
-    WORKING = "working"
-    WAITING_QA = "waiting_qa"
+# Statuses are stored as small integers
+class TaskStatus(IntEnum):
+    PENDING = 0
+    IN_PROGRESS = 1
+    IN_QA = 2
+    BLOCKED = 3
+    COMPLETED = 4
+
+class AgentStatus(IntEnum):
+    IDLE = 0
+    WORKING = 1
+    WAITING_QA = 2
 
 @dataclass
 class Task:
@@ -35,7 +41,7 @@ class Task:
 
     def to_dict(self):
         d = asdict(self)
-        d['status'] = self.status.value
+        d['status'] = self.status.name.lower()
         return d
 
 @dataclass
@@ -47,23 +53,94 @@ class Agent:
     total_tokens_used: int
     conversation_history: list[dict]
 
+# Statements run on every task or agent update. sqlite3 reuses a prepared
+# statement only for identical SQL text, so each one is defined once here.
+_SQL_UPDATE_TASK_STATUS = "UPDATE tasks SET status = ?, assigned_agent = ? WHERE id = ?"
+_SQL_COMPLETE_TASK = "UPDATE tasks SET status = ?, assigned_agent = ?, completed_at = ? WHERE id = ?"
+_SQL_INCREMENT_RETRIES = "UPDATE tasks SET retries = retries + 1 WHERE id = ?"
+_SQL_UPDATE_AGENT_STATUS = "UPDATE agents SET status = ?, current_task_id = ? WHERE id = ?"
+_SQL_ADD_AGENT_TOKENS = "UPDATE agents SET total_tokens_used = total_tokens_used + ? WHERE id = ?"
+_SQL_SAVE_CONVERSATION = "UPDATE agents SET conversation_history = ? WHERE id = ?"
+_SQL_INSERT_LOG = "INSERT INTO logs (timestamp, agent_id, action, details) VALUES (?, ?, ?, ?)"
+
+# Log rows are written in batches by a background thread
+_LOG_FLUSH_INTERVAL = 0.5  # Seconds between batches
+_LOG_FLUSH_BATCH = 64  # Wake the writer early once this many rows are queued
+
+def _now() -> str:
+    """Timestamp for a row, taken once per state change."""
+    return datetime.now().isoformat()
+
+def _status_case(status_enum, column: str) -> str:
+    """SQL mapping the status names older databases stored to their integers."""
+    whens = " ".join(f"WHEN '{status.name.lower()}' THEN {status.value}" for status in status_enum)
+    return f"CASE {column} {whens} END"
+
+@dataclass
+class Checkpoint:
+    timestamp: str
+    completed_tasks: int
+    total_tokens: int
+
 class StateManager:
     def __init__(self, db_path: Path):
         self.db_path = db_path
-        self.conn = sqlite3.connect(str(db_path))
+        self.conn = sqlite3.connect(str(db_path), cached_statements=512)
         self.conn.row_factory = sqlite3.Row
+        self._transaction_depth = 0
         self._init_tables()
 
+        # Token usage is tracked in memory and written out after each task and
+        # at checkpoints, so the circuit breaker's per-tick budget check
+        # doesn't hit the database.
+        self._tokens_lock = threading.Lock()
+        self._token_buffer: dict[str, int] = defaultdict(int)
+        self._cached_total_tokens = self._query_total_tokens()
+
+        # Per-status task counts, kept current on every status change
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status")
+        self._status_counts = Counter({TaskStatus(row[0]): row[1] for row in cursor.fetchall()})
+
+        # The task graph is small, so it's cached in memory and the ready set
+        # is kept current on each status change; SQLite stays the durable copy.
+        self._tasks: dict[int, Task] = {}
+        self._dependents: dict[int, list[int]] = {}
+        self._pending_deps: dict[int, int] = {}  # Uncompleted dependencies per task
+        self._ready: deque[int] = deque()
+        self._load_tasks()
+
+        # Log rows are queued here and inserted by a writer thread with its
+        # own connection, so log() never waits on a commit
+        self._log_queue: deque[tuple] = deque()
+        self._log_wake = threading.Event()
+        self._log_stop = threading.Event()
+        self._log_error: sqlite3.Error = None  # Last failed batch insert
+        self._log_writer = threading.Thread(target=self._write_logs, name="state-log-writer", daemon=True)
+        self._log_writer.start()
+
+        # Set whenever a task changes status; the orchestrator waits on it
+        self.status_changed = asyncio.Event()
+
     def _init_tables(self):
         cursor = self.conn.cursor()
 
+        # WAL with synchronous=NORMAL makes a commit an append to the log
+        # instead of an fsync'd rollback journal
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA mmap_size=268435456")
+
+        legacy_tables = self._rename_legacy_tables(cursor)
+
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS tasks (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 name TEXT NOT NULL,
                 component TEXT NOT NULL,
                 description TEXT NOT NULL,
-                status TEXT DEFAULT 'pending',
+                status INTEGER DEFAULT 0,
                 assigned_agent TEXT,
                 retries INTEGER DEFAULT 0,
                 dependencies TEXT DEFAULT '[]',
@@ -76,7 +153,7 @@ class StateManager:
             CREATE TABLE IF NOT EXISTS agents (
                 id TEXT PRIMARY KEY,
                 agent_type TEXT NOT NULL,
-                status TEXT DEFAULT 'idle',
+                status INTEGER DEFAULT 0,
                 current_task_id INTEGER,
                 total_tokens_used INTEGER DEFAULT 0,
                 conversation_history TEXT DEFAULT '[]'
@@ -103,27 +180,151 @@ class StateManager:
             )
         """)
 
+        if legacy_tables:
+            self._copy_legacy_tables(cursor, legacy_tables)
+
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status, id)")
+
         self.conn.commit()
 
+    def _rename_legacy_tables(self, cursor) -> list[str]:
+        """
+        Move aside tables from databases that stored statuses as text, so
+        they're recreated with INTEGER status columns; _copy_legacy_tables
+        then carries their rows over.
+        """
+        legacy = []
+        for table in ("tasks", "agents"):
+            cursor.execute(f"PRAGMA table_info({table})")
+            types = {row['name']: row['type'] for row in cursor.fetchall()}
+            if types.get("status") == "TEXT":
+                cursor.execute(f"ALTER TABLE {table} RENAME TO {table}_legacy")
+                legacy.append(table)
+        return legacy
+
+    def _copy_legacy_tables(self, cursor, tables: list[str]):
+        if "tasks" in tables:
+            cursor.execute(f"""
+                INSERT INTO tasks (id, name, component, description, status, assigned_agent,
+                                   retries, dependencies, created_at, completed_at)
+                SELECT id, name, component, description, {_status_case(TaskStatus, 'status')},
+                       assigned_agent, retries, dependencies, created_at, completed_at
+                FROM tasks_legacy
+            """)
+        if "agents" in tables:
+            cursor.execute(f"""
+                INSERT INTO agents (id, agent_type, status, current_task_id,
+                                    total_tokens_used, conversation_history)
+                SELECT id, agent_type, {_status_case(AgentStatus, 'status')}, current_task_id,
+                       total_tokens_used, conversation_history
+                FROM agents_legacy
+            """)
+        for table in tables:
+            cursor.execute(f"DROP TABLE {table}_legacy")
+
+    @contextmanager
+    def transaction(self):
+        """
+        Group several state changes into one commit. Methods called inside
+        the block skip their own commit; the outermost block commits once,
+        or rolls back if it raises.
+        """
+        self._transaction_depth += 1
+        try:
+            yield self.conn.cursor()
+        except BaseException:
+            self._transaction_depth -= 1
+            if self._transaction_depth == 0:
+                self.conn.rollback()
+            raise
+        self._transaction_depth -= 1
+        if self._transaction_depth == 0:
+            self.conn.commit()
+
+    def _commit(self):
+        if self._transaction_depth == 0:
+            self.conn.commit()
+
+    def _load_tasks(self):
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT * FROM tasks ORDER BY id")
+        for row in cursor.fetchall():
+            task = self._row_to_task(row)
+            self._tasks[task.id] = task
+        for task in self._tasks.values():
+            self._add_to_graph(task)
+
+    def _add_to_graph(self, task: Task):
+        """Count the task's uncompleted dependencies and queue it if it's ready."""
+        pending = 0
+        for dep_id in task.dependencies:
+            self._dependents.setdefault(dep_id, []).append(task.id)
+            dep = self._tasks.get(dep_id)
+            if dep is None or dep.status != TaskStatus.COMPLETED:
+                pending += 1
+        self._pending_deps[task.id] = pending
+        if pending == 0 and task.status == TaskStatus.PENDING:
+            self._ready.append(task.id)
+
+    def _is_ready(self, task_id: int) -> bool:
+        return (self._pending_deps[task_id] == 0
+                and self._tasks[task_id].status == TaskStatus.PENDING)
+
     # Task operations
     def create_task(self, name: str, component: str, description: str,
                     dependencies: list[int] = None) -> int:
+        created_at = _now()
         cursor = self.conn.cursor()
         cursor.execute("""
             INSERT INTO tasks (name, component, description, dependencies, created_at)
             VALUES (?, ?, ?, ?, ?)
         """, (name, component, description,
-              json.dumps(dependencies or []),
-              datetime.now().isoformat()))
-        self.conn.commit()
-        return cursor.lastrowid
+              orjson.dumps(dependencies or []).decode(),
+              created_at))
+        self._commit()
+        self._status_counts[TaskStatus.PENDING] += 1
+        task = Task(
+            id=cursor.lastrowid,
+            name=name,
+            component=component,
+            description=description,
+            status=TaskStatus.PENDING,
+            assigned_agent=None,
+            retries=0,
+            dependencies=list(dependencies or []),
+            created_at=created_at,
+            completed_at=None
+        )
+        self._tasks[task.id] = task
+        self._add_to_graph(task)
+        return task.id
+
+    def create_tasks(self, task_defs: list[dict]) -> list[int]:
+        """Insert several tasks with one executemany in a single transaction."""
+        created_at = _now()
+        with self.transaction() as cursor:
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM tasks")
+            last_id = cursor.fetchone()[0]
+            cursor.executemany("""
+                INSERT INTO tasks (name, component, description, dependencies, created_at)
+                VALUES (?, ?, ?, ?, ?)
+            """, [(t["name"], t["component"], t["description"],
+                   orjson.dumps(t.get("dependencies") or []).decode(), created_at)
+                  for t in task_defs])
+            cursor.execute("SELECT * FROM tasks WHERE id > ? ORDER BY id", (last_id,))
+            tasks = [self._row_to_task(row) for row in cursor.fetchall()]
+        self._status_counts[TaskStatus.PENDING] += len(tasks)
+        for task in tasks:
+            self._tasks[task.id] = task
+        for task in tasks:
+            self._add_to_graph(task)
+        return [task.id for task in tasks]
 
     def get_task(self, task_id: int) -> Optional[Task]:
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM tasks WHERE id = ?", (task_id,))
-        row = cursor.fetchone()
-        if not row:
-            return None
+        task = self._tasks.get(task_id)
+        return replace(task) if task else None
+
+    def _row_to_task(self, row: sqlite3.Row) -> Task:
         return Task(
             id=row['id'],
             name=row['name'],
@@ -132,138 +333,138 @@ class StateManager:
             status=TaskStatus(row['status']),
             assigned_agent=row['assigned_agent'],
             retries=row['retries'],
-            dependencies=json.loads(row['dependencies']),
+            dependencies=orjson.loads(row['dependencies']),
             created_at=row['created_at'],
             completed_at=row['completed_at']
         )
 
     def get_next_pending_task(self) -> Optional[Task]:
-        """Get next task that is pending and has all dependencies completed."""
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT * FROM tasks
-            WHERE status = 'pending'
-            ORDER BY id ASC
-        """)
-
-        for row in cursor.fetchall():
-            dependencies = json.loads(row['dependencies'])
-            if self._dependencies_met(dependencies):
-                return Task(
-                    id=row['id'],
-                    name=row['name'],
-                    component=row['component'],
-                    description=row['description'],
-                    status=TaskStatus(row['status']),
-                    assigned_agent=row['assigned_agent'],
-                    retries=row['retries'],
-                    dependencies=dependencies,
-                    created_at=row['created_at'],
-                    completed_at=row['completed_at']
-                )
+        """Take the next task that is pending and has all dependencies completed."""
+        while self._ready:
+            task_id = self._ready.popleft()
+            if self._is_ready(task_id):
+                return replace(self._tasks[task_id])
         return None
 
-    def _dependencies_met(self, dep_ids: list[int]) -> bool:
-        if not dep_ids:
-            return True
-        cursor = self.conn.cursor()
-        placeholders = ','.join('?' * len(dep_ids))
-        cursor.execute(f"""
-            SELECT COUNT(*) FROM tasks
-            WHERE id IN ({placeholders}) AND status = 'completed'
-        """, dep_ids)
-        return cursor.fetchone()[0] == len(dep_ids)
+    def take_ready_tasks(self) -> list[Task]:
+        """
+        Take every task that has become ready since the last call. A task is
+        handed out once; it's offered again only if it goes back to pending.
+        """
+        tasks = []
+        while (task := self.get_next_pending_task()) is not None:
+            tasks.append(task)
+        return tasks
 
     def update_task_status(self, task_id: int, status: TaskStatus,
                            assigned_agent: str = None):
+        task = self._tasks.get(task_id)
+        if task is None:
+            return
+        previous = task.status
         cursor = self.conn.cursor()
         if status == TaskStatus.COMPLETED:
-            cursor.execute("""
-                UPDATE tasks SET status = ?, assigned_agent = ?, completed_at = ?
-                WHERE id = ?
-            """, (status.value, assigned_agent, datetime.now().isoformat(), task_id))
+            now = _now()
+            cursor.execute(_SQL_COMPLETE_TASK, (status.value, assigned_agent, now, task_id))
+            task.completed_at = now
         else:
-            cursor.execute("""
-                UPDATE tasks SET status = ?, assigned_agent = ?
-                WHERE id = ?
-            """, (status.value, assigned_agent, task_id))
-        self.conn.commit()
+            cursor.execute(_SQL_UPDATE_TASK_STATUS, (status.value, assigned_agent, task_id))
+        self._commit()
+        task.status = status
+        task.assigned_agent = assigned_agent
+        self._status_counts[previous] -= 1
+        self._status_counts[status] += 1
+
+        # Keep the ready set current
+        if status == TaskStatus.COMPLETED and previous != TaskStatus.COMPLETED:
+            for dependent_id in self._dependents.get(task_id, []):
+                self._pending_deps[dependent_id] -= 1
+                if self._is_ready(dependent_id):
+                    self._ready.append(dependent_id)
+        elif previous == TaskStatus.COMPLETED and status != TaskStatus.COMPLETED:
+            for dependent_id in self._dependents.get(task_id, []):
+                self._pending_deps[dependent_id] += 1
+        if status == TaskStatus.PENDING and previous != TaskStatus.PENDING and self._is_ready(task_id):
+            self._ready.append(task_id)
+        self.status_changed.set()
 
     def increment_task_retries(self, task_id: int) -> int:
         cursor = self.conn.cursor()
-        cursor.execute("""
-            UPDATE tasks SET retries = retries + 1 WHERE id = ?
-        """, (task_id,))
-        self.conn.commit()
-        cursor.execute("SELECT retries FROM tasks WHERE id = ?", (task_id,))
-        return cursor.fetchone()[0]
+        cursor.execute(_SQL_INCREMENT_RETRIES, (task_id,))
+        self._commit()
+        task = self._tasks[task_id]
+        task.retries += 1
+        return task.retries
 
     def get_blocked_task_count(self) -> int:
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM tasks WHERE status = 'blocked'")
-        return cursor.fetchone()[0]
+        return self._status_counts[TaskStatus.BLOCKED]
 
     def get_completed_task_count(self) -> int:
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM tasks WHERE status = 'completed'")
-        return cursor.fetchone()[0]
-
-    def get_all_tasks(self) -> list[Task]:
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM tasks ORDER BY id")
-        tasks = []
-        for row in cursor.fetchall():
-            tasks.append(Task(
-                id=row['id'],
-                name=row['name'],
-                component=row['component'],
-                description=row['description'],
-                status=TaskStatus(row['status']),
-                assigned_agent=row['assigned_agent'],
-                retries=row['retries'],
-                dependencies=json.loads(row['dependencies']),
-                created_at=row['created_at'],
-                completed_at=row['completed_at']
-            ))
-        return tasks
+        return self._status_counts[TaskStatus.COMPLETED]
+
+    def inflight_count(self) -> int:
+        """Number of tasks being coded or in QA review."""
+        return self._status_counts[TaskStatus.IN_PROGRESS] + self._status_counts[TaskStatus.IN_QA]
+
+    def requeue_inflight_tasks(self) -> int:
+        """
+        Put tasks left in progress or in review by an interrupted run back to
+        pending so they're picked up again. Returns how many were requeued.
+        """
+        if not self.inflight_count():
+            return 0
+        stale = [task.id for task in self._tasks.values()
+                 if task.status in (TaskStatus.IN_PROGRESS, TaskStatus.IN_QA)]
+        with self.transaction():
+            for task_id in stale:
+                self.update_task_status(task_id, TaskStatus.PENDING)
+        return len(stale)
+
+    def get_task_status_counts(self) -> Counter:
+        """Number of tasks in each status."""
+        return Counter(self._status_counts)
+
+    def has_tasks(self) -> bool:
+        return bool(self._tasks)
 
     # Agent operations
     def register_agent(self, agent_id: str, agent_type: str):
         cursor = self.conn.cursor()
         cursor.execute("""
             INSERT OR REPLACE INTO agents (id, agent_type, status, total_tokens_used, conversation_history)
-            VALUES (?, ?, 'idle', 0, '[]')
-        """, (agent_id, agent_type))
-        self.conn.commit()
-
-    def get_idle_coding_agent(self) -> Optional[str]:
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT id FROM agents
-            WHERE agent_type = 'coding' AND status = 'idle'
-            LIMIT 1
-        """)
-        row = cursor.fetchone()
-        return row['id'] if row else None
+            VALUES (?, ?, ?, 0, '[]')
+        """, (agent_id, agent_type, AgentStatus.IDLE.value))
+        self._commit()
+        # Re-registering resets the agent's stored count
+        with self._tokens_lock:
+            self._token_buffer.pop(agent_id, None)
+            self._cached_total_tokens = self._query_total_tokens() + sum(self._token_buffer.values())
 
     def update_agent_status(self, agent_id: str, status: AgentStatus,
                             current_task_id: int = None):
         cursor = self.conn.cursor()
-        cursor.execute("""
-            UPDATE agents SET status = ?, current_task_id = ?
-            WHERE id = ?
-        """, (status.value, current_task_id, agent_id))
-        self.conn.commit()
+        cursor.execute(_SQL_UPDATE_AGENT_STATUS, (status.value, current_task_id, agent_id))
+        self._commit()
 
     def add_agent_tokens(self, agent_id: str, tokens: int):
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            UPDATE agents SET total_tokens_used = total_tokens_used + ?
-            WHERE id = ?
-        """, (tokens, agent_id))
-        self.conn.commit()
+        """Buffer token usage reported by an agent; written out by flush_tokens."""
+        with self._tokens_lock:
+            self._token_buffer[agent_id] += tokens
+            self._cached_total_tokens += tokens
+
+    def flush_tokens(self):
+        """Write buffered token usage to the agents table in one transaction."""
+        with self._tokens_lock:
+            buffered, self._token_buffer = self._token_buffer, defaultdict(int)
+        if not buffered:
+            return
+        with self.transaction() as cursor:
+            cursor.executemany(_SQL_ADD_AGENT_TOKENS, [(tokens, agent_id) for agent_id, tokens in buffered.items()])
 
     def get_total_tokens_used(self) -> int:
+        return self._cached_total_tokens
+
+    def _query_total_tokens(self) -> int:
         cursor = self.conn.cursor()
         cursor.execute("SELECT SUM(total_tokens_used) FROM agents")
         result = cursor.fetchone()[0]
@@ -271,40 +472,77 @@ class StateManager:
 
     def save_agent_conversation(self, agent_id: str, history: list[dict]):
         cursor = self.conn.cursor()
-        cursor.execute("""
-            UPDATE agents SET conversation_history = ?
-            WHERE id = ?
-        """, (json.dumps(history), agent_id))
-        self.conn.commit()
+        cursor.execute(_SQL_SAVE_CONVERSATION, (orjson.dumps(history).decode(), agent_id))
+        self._commit()
 
     def get_agent_conversation(self, agent_id: str) -> list[dict]:
         cursor = self.conn.cursor()
         cursor.execute("SELECT conversation_history FROM agents WHERE id = ?", (agent_id,))
         row = cursor.fetchone()
-        return json.loads(row['conversation_history']) if row else []
+        return orjson.loads(row['conversation_history']) if row else []
 
     # Checkpoint operations
     def create_checkpoint(self, state_summary: str = ""):
+        """Record a checkpoint row; the counts come from the in-memory counters."""
+        self.flush_tokens()
         cursor = self.conn.cursor()
         cursor.execute("""
             INSERT INTO checkpoints (timestamp, completed_tasks, total_tokens, state_summary)
             VALUES (?, ?, ?, ?)
         """, (
-            datetime.now().isoformat(),
+            _now(),
             self.get_completed_task_count(),
             self.get_total_tokens_used(),
             state_summary
         ))
-        self.conn.commit()
+        self._commit()
 
-    # Logging
-    def log(self, action: str, details: str = "", agent_id: str = None):
+    def get_latest_checkpoint(self) -> Optional[Checkpoint]:
         cursor = self.conn.cursor()
         cursor.execute("""
-            INSERT INTO logs (timestamp, agent_id, action, details)
-            VALUES (?, ?, ?, ?)
-        """, (datetime.now().isoformat(), agent_id, action, details))
-        self.conn.commit()
+            SELECT timestamp, completed_tasks, total_tokens
+            FROM checkpoints ORDER BY id DESC LIMIT 1
+        """)
+        row = cursor.fetchone()
+        return Checkpoint(*row) if row else None
+
+    # Logging
+    def log(self, action: str, details: str = "", agent_id: str = None):
+        self._log_queue.append((_now(), agent_id, action, details))
+        if len(self._log_queue) >= _LOG_FLUSH_BATCH:
+            self._log_wake.set()
+
+    def _write_logs(self):
+        """Insert queued log rows in batches until close() stops the writer."""
+        conn = sqlite3.connect(str(self.db_path))
+        try:
+            while True:
+                self._log_wake.wait(_LOG_FLUSH_INTERVAL)
+                self._log_wake.clear()
+                # Read before draining so rows logged before close() are written
+                stopping = self._log_stop.is_set()
+                batch = []
+                while self._log_queue:
+                    batch.append(self._log_queue.popleft())
+                if batch:
+                    try:
+                        with conn:
+                            conn.executemany(_SQL_INSERT_LOG, batch)
+                    except sqlite3.Error as e:
+                        # Put the rows back for the next batch; any still
+                        # queued at close() are reported there
+                        self._log_error = e
+                        self._log_queue.extendleft(reversed(batch))
+                if stopping:
+                    return
+        finally:
+            conn.close()
 
     def close(self):
+        self._log_stop.set()
+        self._log_wake.set()
+        self._log_writer.join()
+        if self._log_queue:
+            print(f"Could not write {len(self._log_queue)} log row(s): {self._log_error}")
+        self.flush_tokens()
         self.conn.close()
@@ -179,15 +179,21 @@ Fix any integration bugs.""",
 
 def initialize_tasks(state: StateManager):
     """Load all browser tasks into the database if not already present."""
-    existing = state.get_all_tasks()
-    if existing:
+    if state.has_tasks():
         return  # Tasks already loaded
 
-    for task_def in BROWSER_TASKS:
-        state.create_task(
-            name=task_def["name"],
-            component=task_def["component"],
-            description=task_def["description"],
-            dependencies=task_def["dependencies"]
-        )
-    state.log("tasks_initialized", f"Created {len(BROWSER_TASKS)} tasks")
+    with state.transaction():
+        state.create_tasks(BROWSER_TASKS)
+        state.log("tasks_initialized", f"Created {len(BROWSER_TASKS)} tasks")
+
+
+def print_plan():
+    """Print the task plan straight from BROWSER_TASKS, without opening the database."""
+    print("\nTASK PLAN (dry run):")
+    print("-" * 40)
+    for task_id, task_def in enumerate(BROWSER_TASKS, start=1):
+        deps = task_def["dependencies"]
+        deps = f" (depends on: {deps})" if deps else ""
+        print(f"{task_id}. [{task_def['component']}] {task_def['name']}{deps}")
+    print("-" * 40)
+    print(f"Total tasks: {len(BROWSER_TASKS)}")
@@ -2,6 +2,7 @@
 """Entry point for the multi-agent browser development system."""
 
 import argparse
+import asyncio
 import sys
 
 import config
@@ -30,6 +31,12 @@ def main():
 
     args = parser.parse_args()
 
+    # The plan is static, so a dry run doesn't need the database or agents
+    if args.dry_run:
+        from orchestrator.task_queue import print_plan
+        print_plan()
+        sys.exit(0)
+
     # Validate API key
     if not config.ANTHROPIC_API_KEY:
         print("Error: ANTHROPIC_API_KEY environment variable not set")
@@ -53,7 +60,7 @@ def main():
 
     orchestrator = Orchestrator(resume=args.resume)
     try:
-        orchestrator.run(dry_run=args.dry_run)
+        asyncio.run(orchestrator.run())
     except KeyboardInterrupt:
         print("\n\nInterrupted by user. Creating checkpoint...")
         orchestrator.state.create_checkpoint("User interrupt")